@@ -1,175 +1,337 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import re
 from io import BytesIO
 import os
+# Tesseract's own OpenMP threads would multiply on top of the OCR thread pools; the OpenMP
+# runtime reads this when libtesseract is loaded, so it must be set before importing tesserocr.
+os.environ['OMP_THREAD_LIMIT'] = '1'
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pdf2image import convert_from_bytes
-import pytesseract
+from tesserocr import PyTessBaseAPI, PSM, OEM
 from PIL import Image
 
+# Total budget for concurrent OCR work (pdftocairo renders and Tesseract instances) across all uploads.
+# Based on the CPUs this process may run on, which in a container can be far fewer than os.cpu_count().
+OCR_WORKERS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+# --- 1. COMPILED PATTERNS ---
+# Compiled once at import and shared by the column-wide cleaners and the OCR parser.
+_RE_CURRENCY = re.compile(r'[R$]', re.IGNORECASE)
+_RE_DIGIT_SPACE = re.compile(r'(\d)\s+(\d)')
+_RE_NONNUM = re.compile(r'[^\d\.\-]+')
+_RE_DATE6 = re.compile(r'\s*\d{6}\s+\d{4}\s+\d{2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)', re.IGNORECASE)
+_RE_REF = re.compile(r'(?:Ref\s*|Reference\s*|No\s*|Nr\s*|ID\s*):\s*[\w\d\-]+', re.IGNORECASE)
+_RE_SERIAL = re.compile(r'Serial:\d+/\d+')
+_RE_TXN_PREFIX = re.compile(r'(?:POS Purchase|ATM Withdrawal|Immediate Payment|Internet Pmt To|Teller Transfer Debit|Direct Credit|EFT|IB Payment)\s*', re.IGNORECASE)
+_RE_MULTI_WS = re.compile(r'\s{2,}')
+_RE_YEAR = re.compile(r'(?:Statement Period|Statement Date).*?(\d{4})', re.IGNORECASE)
+# Matches only the OCR lines that matter to the transaction table, in priority order:
+# the table header, a transaction row (date, desc, amount, balance, charges), or an end-of-table line.
+# Horizontal whitespace only ([ \t]), so no match ever spans two lines of the full text.
+_RE_TABLE_LINE = re.compile(
+    r'^[ \t]*(?:'
+    r'(?P<header>(?i:.*Date.*Description.*Amount.*Balance.*Accrued.*))'
+    r'|(?P<date>\d{1,2} \w{3})[ \t]+(?P<desc>.*)[ \t]+(?P<amount>[\d,]+\.\d{2})[ \t]+(?P<balance>[\d,]+\.\d{2} ?(?:Cr|Dr)?)[ \t]+(?P<charges>[\d.]+)'
+    r'|(?P<end>(?i:.*(?:total|balance|summary|closing|turnover).*))'
+    r')[ \t]*$',
+    re.MULTILINE
+)
+
+# Descriptions containing any of these are money in (positive); everything else is money out
+CREDIT_KEYWORDS = ['from', 'credit', 'deposit', 'rtc', 'geo payment from', 'credit absa']
+# Keywords containing a shorter keyword (e.g. 'geo payment from') can never change the outcome,
+# so only the minimal set goes into the alternation scanned once per description
+_CREDIT_RE = re.compile(
+    '|'.join(
+        re.escape(keyword) for keyword in CREDIT_KEYWORDS
+        if not any(other != keyword and other in keyword for other in CREDIT_KEYWORDS)
+    ),
+    re.IGNORECASE
+)
+# Fee rows are excluded from the export
+_FEE_RE = re.compile(r'fee|charge|service', re.IGNORECASE)
+
+# Fallback date layouts as (shape, strptime format, whether the statement year must be appended)
+_DATE_FORMATS = [
+    (re.compile(r'^\d{1,2}/\d{1,2}/\d{4}$'), '%d/%m/%Y', False),
+    (re.compile(r'^\d{1,2}-\d{1,2}-\d{4}$'), '%d-%m-%Y', False),
+    (re.compile(r'^\d{4}-\d{1,2}-\d{1,2}$'), '%Y-%m-%d', False),
+    (re.compile(r'^\d{1,2} [A-Za-z]{3} \d{4}$'), '%d %b %Y', False),
+    (re.compile(r'^\d{1,2}/\d{1,2}$'), '%d/%m %Y', True),
+    (re.compile(r'^\d{1,2}-\d{1,2}$'), '%d-%m %Y', True),
+    (re.compile(r'^\d{1,2} [A-Za-z]{4,}$'), '%d %B %Y', True),
+]
+
 # --- 2. HELPER FUNCTIONS ---
-def clean_value(value):
+def guess_date_format(sample: str) -> tuple[str, bool] | None:
     """
-    Cleans numeric values by handling SA (comma for decimal, space/dot for thousands) format.
-    Kept as a safety net for the AI's JSON output.
+    Picks an explicit day-first format for a raw date string from _DATE_FORMATS.
+    Returns (format, needs_year), or None when the shape is not recognised.
     """
-    if not isinstance(value, str):
-        # Handle direct float/int from AI's JSON output
-        if isinstance(value, (int, float)):
-            return float(value)
-        return None
-    
-    value = str(value).strip().replace('\n', '').replace('\r', '')
-    
-    # 1. Remove currency symbols and merge spaces between digits
-    value = re.sub(r'[R$]', '', value, flags=re.IGNORECASE)
-    value = re.sub(r'(\d)\s+(\d)', r'\1\2', value)
-    # 2. Handle South African formatting (1 000,00 or 1.000,00)
-    if ',' in value and '.' in value:
-        # Assume dot thousand, comma decimal
-        value = value.replace('.', '').replace(',', '.')
-    elif ',' in value:
-        value = value.replace(',', '.')
-    value = value.replace(' ', '')
-    
-    # 4. Clean up formatting indicators (Dr/Cr)
-    # NOTE: This ensures that if the AI missed the sign, the 'Dr' prefix/suffix is converted to a minus sign.
-    if 'dr' in value.lower():
-        value = '-' + re.sub(r'[^\d\.]', '', value)
-    elif 'cr' in value.lower():
-        value = re.sub(r'[^\d\.]', '', value)
-    else:
-        value = re.sub(r'[^\d\.\-]+', '', value)
-    
-    try:
-        return float(value)
-    except:
-        return None
+    for pattern, date_format, needs_year in _DATE_FORMATS:
+        if pattern.match(sample):
+            return date_format, needs_year
+    return None
 
-def clean_description_for_xero(description):
-    """Cleans up transaction descriptions for easy Xero reconciliation."""
-    if not isinstance(description, str): return ""
-    
-    description = description.strip()
+def clean_amount_series(amounts: pd.Series) -> pd.Series:
+    """
+    Cleans a column of text amounts in SA format (comma for decimal, space/dot for thousands) using
+    pandas string ops over the whole column. A 'Dr' marker makes the amount negative and 'Cr' positive;
+    both are detected before currency symbols are stripped, since that strip also removes their 'r'.
+    Unparseable amounts become NaN.
+    """
+    amounts = amounts.astype(str).str.strip().str.replace(r'[\n\r]', '', regex=True)
     
-    # Remove common reference/date patterns left over by extraction
-    description = re.sub(r'\s*\d{6}\s+\d{4}\s+\d{2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)', '', description, flags=re.IGNORECASE)
-    description = re.sub(r'(?:Ref\s*|Reference\s*|No\s*|Nr\s*|ID\s*):\s*[\w\d\-]+', '', description, flags=re.IGNORECASE)
-    description = re.sub(r'Serial:\d+/\d+', '', description)
-    # Remove common transaction type prefixes
-    description = re.sub(r'(?:POS Purchase|ATM Withdrawal|Immediate Payment|Internet Pmt To|Teller Transfer Debit|Direct Credit|EFT|IB Payment)\s*', '', description, flags=re.IGNORECASE)
+    # Clean up formatting indicators (Dr/Cr) before the currency strip removes their 'r'
+    dr_mask = amounts.str.contains('dr', case=False, na=False)
+    cr_mask = ~dr_mask & amounts.str.contains('cr', case=False, na=False)
     
-    description = re.sub(r'\s{2,}', ' ', description).strip(' -').strip()
+    amounts = (
+        amounts.str.replace(_RE_CURRENCY, '', regex=True)
+        .str.replace(_RE_DIGIT_SPACE, r'\1\2', regex=True)
+    )
+    # Dot thousand, comma decimal (1.000,00) when both separators are present
+    both_separators = amounts.str.contains(',', regex=False, na=False) & amounts.str.contains('.', regex=False, na=False)
+    amounts = amounts.where(~both_separators, amounts.str.replace('.', '', regex=False))
+    amounts = amounts.str.replace(',', '.', regex=False).str.replace(_RE_NONNUM, '', regex=True)
     
-    return description
+    cleaned = pd.to_numeric(amounts, errors='coerce').astype(float)
+    cleaned = cleaned.where(~dr_mask, -cleaned.abs())
+    return cleaned.where(~cr_mask, cleaned.abs())
+
+def clean_description_series(descriptions: pd.Series) -> pd.Series:
+    """Cleans up a column of transaction descriptions for easy Xero reconciliation."""
+    descriptions = descriptions.fillna('').astype(str).str.strip()
+    for pattern in (_RE_DATE6, _RE_REF, _RE_SERIAL, _RE_TXN_PREFIX):
+        descriptions = descriptions.str.replace(pattern, '', regex=True)
+    return descriptions.str.replace(_RE_MULTI_WS, ' ', regex=True).str.strip(' -').str.strip()
 
-# --- 4. CORE EXTRACTION LOGIC (OCR with pytesseract - FOR IMAGE-BASED PDFs) ---
-def extract_from_pdf(pdf_file_path: BytesIO, file_name: str) -> tuple[pd.DataFrame, str | None]:
+# --- 4. CORE EXTRACTION LOGIC (OCR with tesserocr - FOR IMAGE-BASED PDFs) ---
+def _ocr_pages(page_paths: list[str]) -> list[str]:
     """
-    Uses OCR (pytesseract) to extract text from image-based PDFs, then parses for year and transactions.
+    OCRs page images with a single in-process Tesseract instance, so the language model is loaded
+    once for all pages instead of once per page. An instance is not thread-safe: call this once per thread.
+    """
+    # LSTM engine only, and treat each page as a single block of text: statement pages
+    # are already upright, so orientation and layout detection are skipped.
+    with PyTessBaseAPI(lang='eng', psm=PSM.SINGLE_BLOCK, oem=OEM.LSTM_ONLY) as api:
+        texts = []
+        for path in page_paths:
+            api.SetImageFile(path)
+            texts.append(api.GetUTF8Text())
+    return texts
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=64)
+def _ocr_text(file_key: str, _pdf_bytes: bytes, _workers: int) -> str:
+    """
+    Renders the PDF pages and OCRs them with at most `_workers` pdftocairo processes and Tesseract
+    instances, returning the page texts joined by blank lines.
+    Cached in memory on `file_key` (a digest of the PDF bytes) so Streamlit reruns skip OCR entirely;
+    the leading underscore keeps Streamlit from hashing the raw bytes again. Statement text is never
+    written to disk, and entries expire after an hour.
+    Kept free of Streamlit output so the cached result can be replayed from any thread.
+    """
+    # Pages are rendered to disk and tesseract reads them by path, so only the page
+    # currently being recognised by each worker is held in memory.
+    with tempfile.TemporaryDirectory() as output_folder:
+        # Convert PDF to grayscale TIFF pages; statements are monochrome text, so colour only costs memory and OCR time
+        page_paths = convert_from_bytes(
+            _pdf_bytes,
+            dpi=200,
+            fmt='tiff',
+            grayscale=True,
+            thread_count=_workers,
+            use_pdftocairo=True,
+            output_folder=output_folder,
+            paths_only=True
+        )
+        
+        # Tesseract releases the GIL while recognising, so pages are dealt round-robin to
+        # worker threads that each own one Tesseract instance, then put back in page order
+        workers = max(1, min(len(page_paths), _workers))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(_ocr_pages, [page_paths[i::workers] for i in range(workers)]))
+        texts = [''] * len(page_paths)
+        for i, chunk in enumerate(chunks):
+            texts[i::workers] = chunk
+    return '\n\n'.join(texts)
+
+def extract_from_pdf(pdf_file_path: BytesIO, file_name: str, messages: list[tuple[str, str]], ocr_workers: int) -> tuple[pd.DataFrame, str | None]:
+    """
+    Uses OCR (tesserocr) to extract text from image-based PDFs, then parses for year and transactions.
     Focuses on excluding fees if detected, extracting StatementYear, and enforcing sign convention.
     Returns a DataFrame and the extracted year (as a string, or None on failure).
+    Status messages are appended to `messages` as (level, text) pairs instead of being rendered.
+    OCR of this file uses at most `ocr_workers` concurrent workers.
     """
-    st.info("🔄 **Initiating OCR Extraction...** (Extracting Year and Transactions from Image-based PDF)")
+    messages.append(('info', "🔄 **Initiating OCR Extraction...** (Extracting Year and Transactions from Image-based PDF)"))
     try:
-        # Convert PDF to images
-        images = convert_from_bytes(pdf_file_path.getvalue())
-        
-        full_text = ''
-        for image in images:
-            text = pytesseract.image_to_string(image)
-            full_text += text + '\n\n'
+        pdf_bytes = pdf_file_path.getvalue()
+        file_key = hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+        full_text = _ocr_text(file_key, pdf_bytes, ocr_workers)
         
         if not full_text.strip():
-            st.error(f"No text extracted from {file_name}. Ensure the PDF has readable content.")
+            messages.append(('error', f"No text extracted from {file_name}. Ensure the PDF has readable content."))
             return pd.DataFrame(), None
         
         # Extract statement year
-        year_pattern = r'(?:Statement Period|Statement Date).*?(\d{4})'
-        match = re.search(year_pattern, full_text, re.IGNORECASE)
+        match = _RE_YEAR.search(full_text)
         statement_year = match.group(1) if match else None
         
-        # Parse transactions from text
-        lines = full_text.splitlines()
-        transactions = []
+        # Parse transactions straight from the full text; lines matching none of the
+        # table patterns are skipped by the regex engine without being split out
+        dates, descs, amounts = [], [], []
         in_table = False
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        for match in _RE_TABLE_LINE.finditer(full_text):
             # Detect table header to start parsing
-            if re.search(r'Date.*Description.*Amount.*Balance.*Accrued', line, re.IGNORECASE):
+            if match['header'] is not None:
                 in_table = True
-                continue
-            if in_table:
-                # Improved regex to capture date, desc, amount, balance, charges
-                match = re.match(r'(\d{1,2} \w{3})\s+(.*)\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2} ?(?:Cr|Dr)?)\s+([\d.]+)$', line)
-                if match:
-                    date = match.group(1)
-                    desc = match.group(2).strip()
-                    amt_str = match.group(3).replace(',', '')
-                    balance_str = match.group(4)
-                    charges = match.group(5)
-                    try:
-                        amt = float(amt_str)
-                    except ValueError:
-                        continue
-                    
-                    # Determine sign based on description keywords
-                    desc_lower = desc.lower()
-                    credit_keywords = ['from', 'credit', 'deposit', 'rtc', 'geo payment from', 'credit absa']
-                    if any(keyword in desc_lower for keyword in credit_keywords):
-                        amt = abs(amt)
-                    else:
-                        amt = -abs(amt)
-                    
-                    transactions.append({'Date': date, 'Description': desc, 'Amount': amt})
-                # If line doesn't match, perhaps end of table
-                elif re.search(r'total|balance|summary|closing|turnover', line, re.IGNORECASE):
-                    in_table = False
+            elif in_table and match['date'] is not None:
+                dates.append(match['date'])
+                descs.append(match['desc'])
+                amounts.append(match['amount'])
+            # A non-transaction line such as a total or closing balance ends the table
+            elif match['end'] is not None:
+                in_table = False
         
-        if not transactions:
-            st.error(f"No transactions parsed from {file_name}. Adjust parsing logic if format differs.")
-            return pd.DataFrame(), None
+        descs = pd.Series(descs, dtype=object).str.strip()
+        amounts = pd.to_numeric(pd.Series(amounts, dtype=object).str.replace(',', '', regex=False), errors='coerce').abs()
+        
+        # Determine sign based on description keywords, in one pass over the whole column
+        is_credit = descs.str.contains(_CREDIT_RE, na=False)
         
-        df = pd.DataFrame(transactions)
+        df = pd.DataFrame({
+            'Date': dates,
+            'Description': descs,
+            'Amount': np.where(is_credit, amounts, -amounts),
+        }).dropna(subset=['Amount']).reset_index(drop=True)
+        
+        if df.empty:
+            messages.append(('error', f"No transactions parsed from {file_name}. Adjust parsing logic if format differs."))
+            return pd.DataFrame(), None
         
         # Exclude fees: Filter out rows where description indicates fee (customize as needed)
-        df = df[~df['Description'].str.contains('fee|charge|service', case=False, na=False)]
+        df = df[~df['Description'].str.contains(_FEE_RE, na=False)]
         
-        st.success(f"OCR Extraction successful! Year **{statement_year or 'Not Found'}** extracted with {len(df)} transactions.")
+        messages.append(('success', f"OCR Extraction successful! Year **{statement_year or 'Not Found'}** extracted with {len(df)} transactions."))
         return df[['Date', 'Description', 'Amount']], statement_year
     
     except Exception as e:
-        st.error(f"OCR Extraction failed for {file_name} due to an unexpected error. Error: {e}")
+        messages.append(('error', f"OCR Extraction failed for {file_name} due to an unexpected error. Error: {e}"))
         return pd.DataFrame(), None
 
-def parse_pdf_data(pdf_file_path, file_name):
+def parse_pdf_data(pdf_file_path, file_name, messages, ocr_workers):
     """Core function: Uses OCR for extraction, returning DataFrame and Year."""
     
     pdf_file_path.seek(0)
     
     # Capture both the DataFrame and the extracted year
-    df_transactions, statement_year = extract_from_pdf(pdf_file_path, file_name)
+    df_transactions, statement_year = extract_from_pdf(pdf_file_path, file_name, messages, ocr_workers)
     
     if not df_transactions.empty and 'Amount' in df_transactions.columns:
         required_cols = ['Date', 'Description', 'Amount']
         if not all(col in df_transactions.columns for col in required_cols):
-            st.error("Extraction output is missing required columns (Date, Description, Amount).")
+            messages.append(('error', "Extraction output is missing required columns (Date, Description, Amount)."))
             return pd.DataFrame(), None
         df_transactions['Date'] = df_transactions['Date'].astype(str)
         df_transactions['Description'] = df_transactions['Description'].astype(str)
         
-        # Use clean_value to standardize the numbers and convert any lingering 'Dr' to '-'
-        df_transactions['Amount'] = df_transactions['Amount'].apply(lambda x: clean_value(str(x)))
+        # The OCR parser already returns signed floats; only text amounts need the full cleanup
+        if pd.api.types.is_numeric_dtype(df_transactions['Amount']):
+            df_transactions['Amount'] = pd.to_numeric(df_transactions['Amount'], errors='coerce')
+        else:
+            # Standardize the numbers and convert any lingering 'Dr' to '-'
+            df_transactions['Amount'] = clean_amount_series(df_transactions['Amount'])
         df_transactions.dropna(subset=['Amount'], inplace=True)
         
         if not df_transactions.empty:
             # Return the processed DataFrame and the extracted year
             return df_transactions[['Date', 'Description', 'Amount']], statement_year
-    st.error(f"Extraction failed for {file_name}. No data or year extracted.")
+    messages.append(('error', f"Extraction failed for {file_name}. No data or year extracted."))
     return pd.DataFrame(), None
 
+def process_one(file_bytes: bytes, file_name: str, ocr_workers: int) -> tuple[pd.DataFrame | None, list[tuple[str, str]]]:
+    """
+    Runs OCR extraction plus description and date cleanup for one uploaded PDF,
+    using this file's share (`ocr_workers`) of the OCR_WORKERS budget.
+    Called from a worker thread, so it never touches Streamlit: the Xero-ready DataFrame
+    (None on failure) is returned together with the status messages to render on the main thread.
+    """
+    messages = []
+    
+    # Capture both the DataFrame and the dynamically extracted year
+    df_transactions, statement_year = parse_pdf_data(BytesIO(file_bytes), file_name, messages, ocr_workers)
+    if df_transactions.empty or 'Amount' not in df_transactions.columns or not statement_year:
+        return None, messages
+    
+    # The dynamically extracted year is now used for standardization
+    current_year = statement_year
+    
+    # Apply final cleaning and formatting
+    df_transactions['Description'] = clean_description_series(df_transactions['Description'])
+    
+    # Extraction already yields the standard Date, Description, Amount columns
+    df_final = df_transactions
+    
+    # --- START: DATE FIX IMPLEMENTATION (Using dynamic year) ---
+    try:
+        # 1. Clean the date string
+        df_final['Date_Raw'] = df_final['Date'].astype(str).str.strip()
+        # 2. Append the correct year to the extracted date (e.g., '01 Sep' -> '01 Sep 2025')
+        df_final['Date_With_Year'] = df_final['Date_Raw'] + ' ' + current_year
+        # 3. Attempt to parse the date using the explicit 'Day AbbreviatedMonth Year' format, which is common.
+        # Statements repeat the same dates many times, so let pandas cache the unique conversions.
+        date_parsed = pd.to_datetime(
+            df_final['Date_With_Year'],
+            format='%d %b %Y',
+            errors='coerce',
+            cache=True
+        )
+        # 4. Handle cases where the extraction may have output the date in a standard format or failed step 3
+        failed_parsing = date_parsed.isna()
+        if failed_parsing.any():
+            # Guess one explicit format from a failed sample rather than inferring per element with dayfirst
+            guessed = guess_date_format(df_final.loc[failed_parsing, 'Date_Raw'].iloc[0])
+            if guessed:
+                fallback_format, needs_year = guessed
+                fallback = pd.to_datetime(
+                    df_final['Date_With_Year' if needs_year else 'Date_Raw'],
+                    format=fallback_format,
+                    errors='coerce',
+                    cache=True
+                )
+                date_parsed = date_parsed.combine_first(fallback)
+        df_final['Date_Parsed'] = date_parsed
+        
+        # 5. Format and update the final 'Date' column
+        df_final['Date'] = df_final['Date_Parsed'].dt.strftime('%d/%m/%Y')
+        
+        # Drop rows where date parsing still failed
+        df_final.dropna(subset=['Date'], inplace=True)
+        
+    except Exception as e:
+        messages.append(('warning', f"Could not standardize dates for {file_name}. Dates remain in raw format. Error: {e}"))
+    # --- END: DATE FIX IMPLEMENTATION ---
+    
+    # Final structure: Date, Description, Amount
+    df_xero = pd.DataFrame({
+        'Date': df_final['Date'].fillna(''),
+        'Description': df_final['Description'].astype(str),
+        'Amount': df_final['Amount'].round(2),
+    })
+    
+    # Ensure the order is exactly Date, Description, Amount
+    df_xero = df_xero[['Date', 'Description', 'Amount']]
+    
+    df_xero.dropna(subset=['Date', 'Amount'], inplace=True)
+    
+    messages.append(('success', f"Successfully extracted {len(df_xero)} transactions from {file_name} (Year: {statement_year})"))
+    return df_xero, messages
+
 # --- 5. STREAMLIT APP LOGIC ---
 if 'uploaded_files' not in st.session_state:
     st.session_state['uploaded_files'] = []
@@ -177,7 +339,7 @@ if 'uploaded_files' not in st.session_state:
 st.set_page_config(page_title="🇿🇦 Free SA Bank Statement to CSV Converter (OCR)", layout="wide")
 st.title("🇿🇦 SA Bank Statement PDF to CSV Converter (Free OCR, No API Key)")
 st.markdown("""
-    ### Using **pytesseract** (free, open-source OCR) to handle image-based PDFs, extract year and transactions, filtering fees. **Credit/Debit sign enforced**.
+    ### Using **Tesseract** via tesserocr (free, open-source OCR) to handle image-based PDFs, extract year and transactions, filtering fees. **Credit/Debit sign enforced**.
     ---
 """)
 
@@ -196,87 +358,38 @@ if uploaded_files:
     
     all_df = []
     
-    for uploaded_file in uploaded_files:
-        file_name = uploaded_file.name
+    # OCR runs in poppler subprocesses and in Tesseract with the GIL released, so a thread pool
+    # processes the files in parallel. The files split the OCR_WORKERS budget between them, so
+    # files x pages-per-file never exceeds it and memory stays bounded however many are uploaded.
+    jobs = [(uploaded_file.read(), uploaded_file.name) for uploaded_file in uploaded_files]
+    file_workers = min(len(jobs), OCR_WORKERS)
+    ocr_workers = max(1, OCR_WORKERS // file_workers)
+    with st.spinner(f"Running OCR on {len(jobs)} file(s)..."):
+        with ThreadPoolExecutor(max_workers=file_workers) as executor:
+            results = list(executor.map(process_one, *zip(*jobs), [ocr_workers] * len(jobs)))
+    
+    for (_, file_name), (df_xero, messages) in zip(jobs, results):
         st.markdown(f"**Processing:** `{file_name}`")
-        
-        pdf_data = BytesIO(uploaded_file.read())
-        
-        # Capture both the DataFrame and the dynamically extracted year
-        df_transactions, statement_year = parse_pdf_data(pdf_data, file_name)
-        if not df_transactions.empty and 'Amount' in df_transactions.columns and statement_year:
-            
-            # The dynamically extracted year is now used for standardization
-            current_year = statement_year
-            
-            # Apply final cleaning and formatting
-            df_transactions['Description'] = df_transactions['Description'].apply(clean_description_for_xero)
-            
-            df_final = df_transactions.rename(columns={
-                'Date': 'Date',
-                'Description': 'Description',
-                'Amount': 'Amount'
-            })
-            
-            # --- START: DATE FIX IMPLEMENTATION (Using dynamic year) ---
-            try:
-                # 1. Clean the date string
-                df_final['Date_Raw'] = df_final['Date'].astype(str).str.strip()
-                # 2. Append the correct year to the extracted date (e.g., '01 Sep' -> '01 Sep 2025')
-                df_final['Date_With_Year'] = df_final['Date_Raw'] + ' ' + current_year
-                # 3. Attempt to parse the date using the explicit 'Day AbbreviatedMonth Year' format, which is common.
-                df_final['Date_Parsed'] = pd.to_datetime(
-                    df_final['Date_With_Year'],
-                    format='%d %b %Y',
-                    errors='coerce'
-                )
-                # 4. Handle cases where the extraction may have output the date in a standard format or failed step 3
-                failed_parsing = df_final['Date_Parsed'].isna()
-                if failed_parsing.any():
-                    # Fallback to general dayfirst parsing on the original raw date
-                    df_final.loc[failed_parsing, 'Date_Parsed'] = pd.to_datetime(
-                        df_final.loc[failed_parsing, 'Date_Raw'],
-                        errors='coerce',
-                        dayfirst=True
-                    )
-                
-                # 5. Format and update the final 'Date' column
-                df_final['Date'] = df_final['Date_Parsed'].dt.strftime('%d/%m/%Y')
-                
-                # Drop rows where date parsing still failed
-                df_final.dropna(subset=['Date'], inplace=True)
-                
-            except Exception as e:
-                st.warning(f"Could not standardize dates for {file_name}. Dates remain in raw format. Error: {e}")
-            # --- END: DATE FIX IMPLEMENTATION ---
-            
-            # Final structure: Date, Description, Amount
-            df_xero = pd.DataFrame({
-                'Date': df_final['Date'].fillna(''),
-                'Description': df_final['Description'].astype(str),
-                'Amount': df_final['Amount'].round(2),
-            })
-            
-            # Ensure the order is exactly Date, Description, Amount
-            df_xero = df_xero[['Date', 'Description', 'Amount']]
-            
-            df_xero.dropna(subset=['Date', 'Amount'], inplace=True)
-            
+        for level, message in messages:
+            getattr(st, level)(message)
+        if df_xero is not None:
             all_df.append(df_xero)
-            
-            st.success(f"Successfully extracted {len(df_xero)} transactions from {file_name} (Year: {statement_year})")
     
     # --- 6. COMBINE AND DOWNLOAD ---
     if all_df:
-        final_combined_df = pd.concat(all_df, ignore_index=True)
+        final_combined_df = pd.concat(all_df, ignore_index=True, sort=False)
+        # Merchants repeat heavily across statements; a category column stores each description once
+        final_combined_df['Description'] = final_combined_df['Description'].astype('category')
         
         st.markdown("---")
         st.subheader("✅ All Transactions Combined and Ready for Download (Fees Excluded, Year Dynamic)")
         
         st.dataframe(final_combined_df)
         
-        # Convert DataFrame to CSV for download
-        csv_output = final_combined_df.to_csv(index=False, sep=',', encoding='utf-8')
+        # Write the CSV straight into a byte buffer for download, skipping the intermediate str
+        csv_output = BytesIO()
+        final_combined_df.to_csv(csv_output, index=False, sep=',', encoding='utf-8')
+        csv_output.seek(0)
         st.download_button(
             label="⬇️ Download Column-Filtered CSV File",
             data=csv_output,